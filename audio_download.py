@@ -0,0 +1,34 @@
+import yt_dlp
+
+from downloader import DownloadError, download
+
+URL="https://www.youtube.com/watch?v=uH9d_c_QX_E" # youtube link
+
+# one extractor for the whole process, so player and signature data are only
+# fetched once no matter how many downloads go through it
+_YDL = yt_dlp.YoutubeDL({
+    'format': 'bestaudio/best',
+    'quiet': True,
+    'noplaylist': True,
+    'extract_flat': False,
+    'skip_download': False,
+    'writeinfojson': False,
+    'writethumbnail': False,
+})
+
+
+def download_audio(url, connections=6):
+    try:
+        info = _YDL.extract_info(url, download=False)
+        path = _YDL.prepare_filename(info)
+        if info.get('protocol') not in ('http', 'https'):
+            # HLS/DASH manifests and the like need yt-dlp's own downloaders
+            _YDL.process_info(info)
+            return path
+        return download(info['url'], path, connections, headers=info.get('http_headers'))
+    except Exception as e:
+        raise DownloadError(f"Failed to download audio {url}") from e
+
+
+if __name__ == "__main__":
+    download_audio(URL) # will save file in current directory
@@ -0,0 +1,316 @@
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import certifi
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+# big reads keep the per-chunk Python and syscall overhead negligible next to
+# the transfer itself; tiny reads made large files many times slower
+CHUNK_SIZE = 1024 * 1024
+
+# bounds for the adaptive chunk size picked by _choose_chunk_size
+PROBE_SIZE = 256 * 1024
+MIN_CHUNK_SIZE = 512 * 1024
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+
+# the mp4 movie header is usually 100-500 KB and sits at the front of the file
+HEADER_SIZE = 512 * 1024
+
+# (connect, read) seconds; without a read timeout a stalled connection blocks
+# a worker forever instead of failing so the download can be resumed
+TIMEOUT = (10, 30)
+
+# shared by every request in the process (including pytube's metadata calls)
+# so TCP and TLS sessions are kept alive instead of renegotiated per request
+SESSION = requests.Session()
+SESSION.verify = certifi.where()
+SESSION.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=32,
+                                      max_retries=Retry(total=3, backoff_factor=0.3)))
+
+
+class DownloadError(RuntimeError):
+    pass
+
+
+class _RangeNotSupported(Exception):
+    pass
+
+
+def _choose_chunk_size(url, headers):
+    # Time a small range request: the wait for the headers approximates the
+    # round trip, the body gives the per-connection bandwidth. Every range
+    # costs one round trip before data flows, so a range of k bandwidth-delay
+    # products keeps the connection busy k/(k+1) of the time; 4 gives ~80%.
+    start = time.monotonic()
+    with SESSION.get(url, headers={**headers, 'Range': f'bytes=0-{PROBE_SIZE - 1}'}, stream=True,
+                     timeout=TIMEOUT) as r:
+        r.raise_for_status()
+        rtt = time.monotonic() - start
+        received = len(r.raw.read(PROBE_SIZE))
+    transfer = time.monotonic() - start - rtt
+    if not received or transfer <= 0:
+        return MAX_CHUNK_SIZE
+    bandwidth = received / transfer
+    return int(min(max(bandwidth * rtt * 4, MIN_CHUNK_SIZE), MAX_CHUNK_SIZE))
+
+
+def _preallocate(f, size):
+    # reserve all the blocks up front instead of growing the file as data
+    # arrives, which fragments large files and keeps updating their metadata
+    try:
+        os.posix_fallocate(f.fileno(), 0, size)
+    except (AttributeError, OSError):
+        f.truncate(size)
+
+
+def _check_cancel(cancel):
+    if cancel.is_set():
+        raise DownloadError("Download cancelled")
+
+
+def _fetch_whole(url, path, headers, cancel, size=0, chunk_size=CHUNK_SIZE):
+    with SESSION.get(url, headers=headers, stream=True, timeout=TIMEOUT) as r:
+        r.raise_for_status()
+        with open(path, 'wb') as f:
+            if size:
+                _preallocate(f, size)
+            # iter_content rather than copyfileobj(r.raw): it undoes any
+            # Content-Encoding the server applies despite identity being
+            # asked for, and leaves room to notice a cancel between chunks
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                _check_cancel(cancel)
+                f.write(chunk)
+            # preallocation already gave the file its full size, so count
+            # what was actually written
+            if size and f.tell() != size:
+                raise DownloadError(f"Expected {size} bytes from {url}, got {f.tell()}")
+
+
+def _locked_pwrite():
+    # os.pwrite is Unix-only; elsewhere the workers share the fd, so each
+    # seek+write pair has to happen under a lock
+    lock = threading.Lock()
+
+    def pwrite(fd, data, offset):
+        with lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            return os.write(fd, data)
+    return pwrite
+
+
+def _range_worker(url, headers, fd, cancel):
+    # Everything but the range is fixed for the whole download, so bind it
+    # once as default arguments: the hot read/pwrite loop then works on
+    # fast locals instead of looking up globals and attributes per chunk.
+    # Reads are CHUNK_SIZE regardless of how big the range itself is.
+    pwrite = os.pwrite if hasattr(os, 'pwrite') else _locked_pwrite()
+
+    def fetch(lo, hi, _get=SESSION.get, _pwrite=pwrite, _url=url, _headers=headers, _fd=fd,
+              _cancel=cancel, _read_size=CHUNK_SIZE, _timeout=TIMEOUT):
+        with _get(_url, headers={**_headers, 'Range': f'bytes={lo}-{hi}'}, stream=True,
+                  timeout=_timeout) as r:
+            r.raise_for_status()
+            if r.status_code != 206:
+                raise _RangeNotSupported
+            # a server may legally answer with less than was asked for
+            content_range = r.headers.get('Content-Range', '')
+            if not content_range.startswith(f'bytes {lo}-'):
+                raise DownloadError(f"Asked for bytes {lo}-{hi}, got {content_range or 'no Content-Range'}")
+            offset = lo
+            for chunk in r.iter_content(chunk_size=_read_size):
+                if _cancel.is_set():
+                    raise DownloadError("Download cancelled")
+                view = memoryview(chunk)
+                while view:
+                    n = _pwrite(_fd, view, offset)
+                    view = view[n:]
+                    offset += n
+            if offset != hi + 1:
+                raise DownloadError(f"Asked for bytes {lo}-{hi}, got {lo}-{offset - 1}")
+    return fetch
+
+
+def _fetch_ranges(url, headers, path, size, connections, chunk_size, done, cancel):
+    # ranges of one chunk each, handed out to the workers as they free up;
+    # the start of every finished range is added to done, and ranges already
+    # in done (from an earlier, interrupted run) are skipped
+    with open(path, 'r+b' if done else 'wb') as f:
+        _preallocate(f, size)
+        fetch = _range_worker(url, headers, f.fileno(), cancel)
+        with ThreadPoolExecutor(max_workers=connections) as pool:
+            jobs = []
+            for lo in range(0, size, chunk_size):
+                if lo in done:
+                    continue
+                job = pool.submit(fetch, lo, min(lo + chunk_size, size) - 1)
+                job.add_done_callback(
+                    lambda job, lo=lo: job.cancelled() or job.exception() or done.add(lo))
+                jobs.append(job)
+            try:
+                for job in jobs:
+                    job.result()
+            except BaseException:
+                pool.shutdown(cancel_futures=True)
+                raise
+
+
+def _sha256(path):
+    with open(path, 'rb') as f:
+        if hasattr(hashlib, 'file_digest'):  # Python 3.11+
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+        digest = hashlib.sha256()
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+
+def _load_progress(path, size):
+    # what an interrupted download of the same file left behind, if anything;
+    # stream URLs are re-signed on every resolve, so match on size, not URL
+    try:
+        with open(path + '.part.json') as f:
+            progress = json.load(f)
+        if progress['size'] == size and os.path.getsize(path + '.part') == size:
+            return progress
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+
+def _save_progress(path, size, chunk_size, done):
+    with open(path + '.part.json', 'w') as f:
+        json.dump({'size': size, 'chunk_size': chunk_size, 'done': sorted(done)}, f)
+
+
+def _clear_progress(path):
+    try:
+        os.remove(path + '.part.json')
+    except FileNotFoundError:
+        pass
+
+
+def download(url, path, connections=6, sha256=None, headers=None, cancel=None):
+    """Download url to path over several concurrent Range requests.
+
+    YouTube throttles each connection, so splitting the body into byte
+    ranges and fetching them side by side gets closer to the real
+    bandwidth. The range size is tuned to the measured link speed.
+    Falls back to a single GET when the size is unknown or the server
+    answers a range request with the whole body (HTTP 200).
+
+    headers are sent with every request, for streams that need the same
+    ones their extractor used (yt-dlp's info['http_headers']).
+
+    Data goes to path + '.part' and is only moved to path once complete
+    (and, if sha256 is given, verified). If the download is interrupted,
+    the finished ranges are recorded in path + '.part.json' and the next
+    call for the same file only fetches the rest.
+
+    cancel is an optional threading.Event. When download() runs off the
+    main thread, Ctrl-C never reaches it; setting the event makes it stop
+    after the current chunks, save its progress and raise DownloadError.
+    """
+    cancel = cancel or threading.Event()
+    # media is stored as served, so keep it from being compressed in transit
+    headers = {**(headers or {}), 'Accept-Encoding': 'identity'}
+    part = path + '.part'
+    head = SESSION.head(url, headers=headers, allow_redirects=True, timeout=TIMEOUT)
+    head.raise_for_status()
+    size = int(head.headers.get('Content-Length', 0))
+    if size == 0:
+        _fetch_whole(url, part, headers, cancel)
+    else:
+        progress = _load_progress(path, size)
+        if progress:
+            chunk_size, done = progress['chunk_size'], set(progress['done'])
+        else:
+            chunk_size, done = _choose_chunk_size(url, headers), set()
+        try:
+            _fetch_ranges(url, headers, part, size, max(connections, 1), chunk_size, done, cancel)
+        except _RangeNotSupported:
+            _clear_progress(path)
+            _fetch_whole(url, part, headers, cancel, size, chunk_size)
+        except BaseException:
+            if done:
+                _save_progress(path, size, chunk_size, done)
+            raise
+        _clear_progress(path)
+    if sha256 and _sha256(part) != sha256.lower():
+        os.remove(part)
+        raise DownloadError(f"SHA-256 mismatch for {path}")
+    os.replace(part, path)
+    return path
+
+
+def _read_range(url, lo, hi):
+    # the requested bytes and the total size of the file
+    with SESSION.get(url, headers={'Range': f'bytes={lo}-{hi}', 'Accept-Encoding': 'identity'},
+                     stream=True, timeout=TIMEOUT) as r:
+        r.raise_for_status()
+        if r.status_code != 206:
+            raise _RangeNotSupported
+        total = r.headers.get('Content-Range', '').rpartition('/')[2]
+        return r.raw.read(hi - lo + 1), int(total) if total.isdigit() else None
+
+
+def prefetch_header(url):
+    """Fetch just the movie header (moov box) of the mp4 at url.
+
+    Reads the first HEADER_SIZE bytes and walks the top-level boxes. When
+    moov comes after the media data, only the box headers on the way and
+    the moov box itself are requested. Returns the moov bytes, or None if
+    the file has no top-level moov box or the server doesn't serve ranges.
+    """
+    try:
+        data, total = _read_range(url, 0, HEADER_SIZE - 1)
+    except _RangeNotSupported:
+        return None
+    if total is None:
+        # without the file size, only walk what the first read returned
+        total = len(data)
+    offset = 0
+    while offset + 8 <= total:
+        if offset + 16 <= len(data) or len(data) == total:
+            header = data[offset:offset + 16]
+        else:
+            header, _ = _read_range(url, offset, min(offset + 16, total) - 1)
+        if len(header) < 8:
+            return None
+        size, kind = struct.unpack('>I4s', header[:8])
+        if size == 1 and len(header) == 16:
+            size, = struct.unpack('>Q', header[8:])
+        if size < 8:
+            return None
+        if kind == b'moov':
+            if offset + size <= len(data):
+                return data[offset:offset + size]
+            return _read_range(url, offset, offset + size - 1)[0]
+        offset += size
+    return None
+
+
+def moov_duration(moov):
+    """Duration in seconds from the mvhd box of a moov box, or None."""
+    offset = 8
+    while offset + 8 <= len(moov):
+        size, kind = struct.unpack_from('>I4s', moov, offset)
+        if kind == b'mvhd':
+            # version 1 has 64-bit times, version 0 32-bit ones
+            if offset + 9 > len(moov):
+                return None
+            fields, start = ('>IQ', offset + 28) if moov[offset + 8] == 1 else ('>II', offset + 20)
+            if start + struct.calcsize(fields) > min(len(moov), offset + size):
+                return None
+            timescale, duration = struct.unpack_from(fields, moov, start)
+            return duration / timescale if timescale else None
+        if size < 8:
+            return None
+        offset += size
+    return None
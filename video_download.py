@@ -0,0 +1,190 @@
+import asyncio
+import glob
+import hashlib
+import io
+import json
+import os
+import pickle
+import socket
+import threading
+from urllib.error import HTTPError, URLError
+
+import pytube
+import requests
+from pytube import YouTube, cipher, extract, request
+
+from downloader import SESSION, TIMEOUT, DownloadError, download, moov_duration, prefetch_header
+
+SAVE_PATH="" # path to save the file
+LINK=""      # link to youtube video
+
+CIPHER_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "ydl") # decoded player ciphers
+CIPHER_CACHE_SIZE = 8 # player versions to keep
+
+
+class _Response:
+    # the bits of urllib's response object that pytube reads
+    def __init__(self, response):
+        self._response = response
+        self._body = io.BytesIO(response.content)
+
+    def read(self, amt=None):
+        return self._body.read(amt)
+
+    def info(self):
+        return self._response.headers
+
+
+def _execute_request(url, method=None, headers=None, data=None, timeout=None):
+    # drop-in for pytube.request._execute_request that goes through SESSION
+    # instead of opening a new urllib connection for every metadata fetch
+    base_headers = {"User-Agent": "Mozilla/5.0", "accept-language": "en-US,en"}
+    if headers:
+        base_headers.update(headers)
+    if data and not isinstance(data, bytes):
+        data = bytes(json.dumps(data), encoding="utf-8")
+    if not isinstance(timeout, (int, float)):
+        timeout = TIMEOUT
+    # pytube handles urllib's exceptions, so raise those rather than requests'
+    try:
+        response = SESSION.request(method or "GET", url, headers=base_headers, data=data, timeout=timeout)
+    except requests.Timeout as e:
+        raise socket.timeout(str(e)) from e
+    except requests.RequestException as e:
+        raise URLError(e) from e
+    if response.status_code >= 400:
+        raise HTTPError(url, response.status_code, response.reason, response.headers,
+                        io.BytesIO(response.content))
+    return _Response(response)
+
+
+request._execute_request = _execute_request
+
+
+_cipher_init = cipher.Cipher.__init__
+
+
+def _cached_cipher_init(self, js):
+    # Building a Cipher runs pytube's regexes over the whole ~2 MB player JS,
+    # but the result only changes when YouTube ships a new player, so the
+    # last few are kept on disk keyed by a hash of the JS. The pytube version
+    # is part of the key: the pickle is pytube's Cipher state, and an upgrade
+    # (the usual fix when YouTube breaks it) may change its layout.
+    key = hashlib.sha1(f"{pytube.__version__}\n{js}".encode()).hexdigest()
+    path = os.path.join(CIPHER_CACHE, f"cipher_{key}.pkl")
+    try:
+        with open(path, "rb") as f:
+            self.__dict__.update(pickle.load(f))
+        os.utime(path)
+        return
+    except Exception:
+        pass
+    _cipher_init(self, js)
+    try:
+        os.makedirs(CIPHER_CACHE, exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(self.__dict__, f)
+        os.replace(path + ".tmp", path)
+        cached = sorted(glob.glob(os.path.join(CIPHER_CACHE, "cipher_*.pkl")), key=os.path.getmtime)
+        for old in cached[:-CIPHER_CACHE_SIZE]:
+            os.remove(old)
+    except Exception:
+        pass
+
+
+cipher.Cipher.__init__ = _cached_cipher_init
+
+
+async def resolve_stream(link):
+    # The watch page (and the player JS it points to) and the innertube
+    # player response don't depend on each other, so fetch them side by side
+    # instead of paying their round trips one after another. pytube caches
+    # both on the YouTube object, so .streams below doesn't refetch them.
+    yt = YouTube(link)
+
+    def player_js():
+        yt.watch_html
+        return yt.js
+
+    def best_stream():
+        streams = yt.streams.filter(progressive=True,file_extension='mp4')
+        return max(streams, key=lambda s: int(s.resolution.rstrip('p')))
+
+    await asyncio.gather(asyncio.to_thread(player_js), asyncio.to_thread(lambda: yt.vid_info))
+    # building the streams deciphers signatures and may refetch pages, so it
+    # stays off the event loop too
+    return await asyncio.to_thread(best_stream)
+
+
+async def _download_one(link, save_path, connections, claimed=None):
+    cancel = threading.Event()
+    try:
+        stream = await resolve_stream(link)
+        if save_path:
+            os.makedirs(save_path, exist_ok=True)
+        path = os.path.join(save_path, stream.default_filename)
+        if claimed is not None:
+            # another video in the same batch with the same title would share
+            # the .part files, so tell them apart by video id
+            if os.path.normcase(os.path.abspath(path)) in claimed:
+                root, ext = os.path.splitext(path)
+                path = f"{root} [{extract.video_id(link)}]{ext}"
+            claimed.add(os.path.normcase(os.path.abspath(path)))
+        # the header is tiny, so read it while the body downloads in the
+        # background; it is only a nicety, so it never fails the download
+        job = asyncio.ensure_future(asyncio.to_thread(download, stream.url, path, connections, cancel=cancel))
+        try:
+            moov = await asyncio.to_thread(prefetch_header, stream.url)
+            duration = moov_duration(moov) if moov else None
+        except Exception:
+            duration = None
+        return await job, duration
+    except asyncio.CancelledError:
+        # Ctrl-C under asyncio.run cancels this task, but that can't
+        # interrupt the download thread; tell it to stop and save progress
+        cancel.set()
+        raise
+    except Exception as e:
+        raise DownloadError(f"Failed to download video {link}") from e
+
+
+def download_video(link, save_path="", connections=6):
+    # returns (path, duration in seconds or None)
+    return asyncio.run(_download_one(link, save_path, connections))
+
+
+def _video_key(link):
+    try:
+        return extract.video_id(link)
+    except Exception:
+        return link
+
+
+async def download_many(links, save_path="", connections=6, max_concurrent=4):
+    # overlap the metadata round trips and downloads of several videos, but
+    # cap how many run at once so YouTube doesn't start rate limiting us;
+    # returns one (path, duration) or DownloadError per link, in order, so a
+    # bad link doesn't throw away the others
+    sem = asyncio.Semaphore(max_concurrent)
+    claimed = set()
+
+    async def one(link):
+        async with sem:
+            return await _download_one(link, save_path, connections, claimed)
+
+    # the same video under different links is only downloaded once
+    jobs = {}
+    for link in links:
+        if _video_key(link) not in jobs:
+            jobs[_video_key(link)] = asyncio.ensure_future(one(link))
+    return await asyncio.gather(*(jobs[_video_key(link)] for link in links), return_exceptions=True)
+
+
+if __name__ == "__main__":
+    try:
+        path, duration = download_video(LINK, SAVE_PATH)
+        if duration:
+            print(f"Duration: {duration:.0f}s")
+        print("Video downloaded")
+    except DownloadError:
+        print("Error: Couldn't download the video")